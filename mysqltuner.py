@@ -13,19 +13,36 @@ Notes:
   originally written for Perl, verify operators and function names.
 """
 
-import argparse
+from __future__ import annotations
+
+import ast
+import functools
+import math
 import os
 import re
 import sys
-import configparser
-import getpass
-from typing import Dict, List, Tuple, Any
+import types
+from collections import namedtuple
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import argparse
+    from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
 
 
- 
+# Pre-compiled patterns used on the hot config-evaluation paths. Compiling once
+# at import time avoids the per-call pattern-cache lookup inside the re module.
+_NUMERIC_RE = re.compile(r"^-?\d+\.?\d*(e[+-]?\d+)?$", re.IGNORECASE)
+_KV_LINE_RE = re.compile(r"^([A-Za-z_][A-Za-z0-9_]*)[ \t]*(.*)$", re.MULTILINE)
+_CAT_HEADER_RE = re.compile(r"^\s*#\s*Category\s*:\s*(.+?)\s*$", re.IGNORECASE)
+_RE_MATCH_RE = re.compile(r"=~\s*/(.+?)/([a-zA-Z]*)$")
+_NRE_MATCH_RE = re.compile(r"!~\s*/(.+?)/([a-zA-Z]*)$")
+_LEAD_CMP_RE = re.compile(r"^[<>!=]")
 
 
 def parse_args() -> argparse.Namespace:
+    import argparse
+
     parser = argparse.ArgumentParser(
         add_help=False,
         description="Python port of mysqltuner.pl. Requires a config file.",
@@ -62,6 +79,8 @@ def parse_args() -> argparse.Namespace:
         print_usage_and_exit()
     # Prompt for password if -p was provided without a value
     if args.password == "":
+        import getpass
+
         try:
             args.password = getpass.getpass("Enter password: ")
         except Exception:
@@ -116,6 +135,8 @@ def load_defaults_extra_file(path: str, debug: bool) -> Dict[str, str]:
     Reads both [client] and [mysqltuner] sections. Values from [mysqltuner]
     override those from [client]. Returns a flat dict of string values.
     """
+    import configparser
+
     full_path = os.path.expanduser(path)
     if not os.path.isfile(full_path):
         print(f"ERROR: defaults-extra-file not found: {full_path}", file=sys.stderr)
@@ -191,6 +212,9 @@ def get_mysql_kv_from_live(args: argparse.Namespace) -> Dict[str, Any]:
         connect_kwargs["password"] = args.password
     if args.socket and not args.host:
         connect_kwargs["unix_socket"] = args.socket
+    # Prefer the C extension; the connector falls back to the pure-Python
+    # implementation automatically when it is not available.
+    connect_kwargs["use_pure"] = False
 
     # Enforce remote forcemem parity similar to Perl script
     if args.host and args.host not in ("127.0.0.1", "localhost") and args.forcemem is None:
@@ -204,12 +228,17 @@ def get_mysql_kv_from_live(args: argparse.Namespace) -> Dict[str, Any]:
         sys.exit(30)
 
     cursor = connection.cursor()
+    # Fetch rows in large batches; the driver default arraysize of 1 makes
+    # fetchall() pay a round trip per row batch.
+    cursor.arraysize = 1024
     kv: Dict[str, Any] = {}
-    for statement in ("SHOW /*!40003 GLOBAL */ VARIABLES", "SHOW /*!50002 GLOBAL */ STATUS"):
-        cursor.execute(statement)
-        rows = cursor.fetchall()
+    # Send both SHOW statements in one round trip instead of two
+    statements = "SHOW /*!40003 GLOBAL */ VARIABLES; SHOW /*!50002 GLOBAL */ STATUS"
+    for result in cursor.execute(statements, multi=True):
+        if not result.with_rows:
+            continue
         # Expect 2 columns: Variable_name, Value
-        for row in rows:
+        for row in result.fetchall():
             if len(row) >= 2:
                 key = str(row[0])
                 value = row[1]
@@ -233,35 +262,49 @@ def get_mysql_kv_from_files(filelist_arg: str, debug: bool) -> Dict[str, Any]:
             continue
         try:
             with open(filename, "r", encoding="utf-8", errors="ignore") as f:
-                for raw in f:
-                    line = raw.rstrip("\n")
-                    match = re.match(r"([A-Za-z_][A-Za-z0-9_]*)\s*(.*)", line)
-                    if match:
-                        key, value = match.group(1), match.group(2)
-                        kv[key] = value
+                text = f.read()
         except OSError:
             print(f"cannot open {filename}", file=sys.stderr)
             sys.exit(1)
+        # One C-level regex pass over the whole file instead of a Python-level
+        # match per line; findall returns the (key, value) pairs directly.
+        kv.update(_KV_LINE_RE.findall(text))
     return kv
 
 
-def read_config_file(path: str, debug: bool) -> List[str]:
+def read_config_file(path: str, debug: bool) -> Iterator[str]:
+    """Yield config lines lazily instead of materializing the whole file."""
     debug_print(debug, f"Reading from {path}")
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.readlines()
+        yield from f
 
 
 def is_numeric_string(value: str) -> bool:
-    return bool(re.match(r"^-?\d+\.?\d*(e[+-]?\d+)?$", str(value), flags=re.IGNORECASE))
+    if not isinstance(value, str):
+        value = str(value)
+    if not value:
+        return False
+    # Cheap screen: most MySQL string values ("ON", paths, version strings)
+    # are obviously non-numeric, so reject them before running the regex.
+    first = value[1] if value[0] in "+-" and len(value) > 1 else value[0]
+    if not (first.isdigit() or first == "."):
+        return False
+    return _NUMERIC_RE.match(value) is not None
 
 
-def round2_if_numeric(value: Any, expr_text: str) -> Any:
+@functools.lru_cache(maxsize=4096)
+def _expr_mentions_version(expr_text: str) -> bool:
+    """Computed once per unique expression so the hot loop skips the lower()."""
+    return "version" in expr_text.lower()
+
+
+def round2_if_numeric(value: Any, is_version_expr: bool = False) -> Any:
     if isinstance(value, (int, float)):
-        return float(f"{float(value):.2f}")
+        return round(float(value), 2)
     # When we get string results, mimic Perl behavior: only round numeric strings and skip 'version'
-    if isinstance(value, str) and "version" not in expr_text.lower() and is_numeric_string(value):
+    if isinstance(value, str) and not is_version_expr and is_numeric_string(value):
         try:
-            return float(f"{float(value):.2f}")
+            return round(float(value), 2)
         except Exception:
             return value
     return value
@@ -269,7 +312,7 @@ def round2_if_numeric(value: Any, expr_text: str) -> Any:
 
 # Helper functions available to expressions and formatting
 def hr_bytime(per_second_rate: float) -> str:
-    num = float(per_second_rate)
+    num = per_second_rate if isinstance(per_second_rate, float) else float(per_second_rate)
     label = "per second"
     if num >= 1:
         pass
@@ -282,54 +325,45 @@ def hr_bytime(per_second_rate: float) -> str:
     else:
         num = num * 86400
         label = "per day"
-    return f"{round2_if_numeric(num, '')} {label}"
+    return f"{round2_if_numeric(num)} {label}"
 
 
-def hr_bytes(num: float) -> str:
-    n = float(num)
-    kb = 1024.0
-    mb = kb * 1024.0
-    gb = mb * 1024.0
-    tb = gb * 1024.0
-    pb = tb * 1024.0
-    eb = pb * 1024.0
-    zb = eb * 1024.0
-    yb = zb * 1024.0
-    
-    if n >= yb:
-        return f"{n / yb:.1f} Yb"
-    if n >= zb:
-        return f"{n / zb:.1f} Zb"
-    if n >= eb:
-        return f"{n / eb:.1f} Eb"
-    if n >= pb:
-        return f"{n / pb:.1f} Pb"
-    if n >= tb:
-        return f"{n / tb:.1f} Tb"
-    if n >= gb:
-        return f"{n / gb:.1f} Gb"
-    if n >= mb:
-        return f"{n / mb:.1f} Mb"
-    if n >= kb:
-        return f"{n / kb:.1f} Kb"
-    return f"{int(n)} bytes" if n.is_integer() else f"{n} bytes"
+# Unit tables indexed by log of the value, ascending: entry i covers
+# base**i <= n < base**(i+1).
+_BYTES_UNITS = tuple(
+    (1024.0 ** i, suffix)
+    for i, suffix in enumerate(("bytes", "Kb", "Mb", "Gb", "Tb", "Pb", "Eb", "Zb", "Yb"))
+)
+SCALES = tuple(
+    (1000.0 ** i, name)
+    for i, name in enumerate(("", "Thousand", "Million", "Billion", "Trillion", "Quadrillion"))
+)
 
-def hr_num(num: float) -> str:
-    n = float(num)
-SCALES = [
-    (1000.0**5, "Quadrillion"),
-    (1000.0**4, "Trillion"),
-    (1000.0**3, "Billion"),
-    (1000.0**2, "Million"),
-    (1000.0, "Thousand"),
-]
+
+def _scale_index(n: float, base: float, table) -> int:
+    """Pick the table entry for `n` in O(1) via log, nudging for float error
+    at exact unit boundaries."""
+    idx = min(int(math.log(n, base)), len(table) - 1)
+    if n < table[idx][0]:
+        idx -= 1
+    elif idx + 1 < len(table) and n >= table[idx + 1][0]:
+        idx += 1
+    return idx
+
+
+def hr_bytes(num: float) -> str:
+    n = num if isinstance(num, float) else float(num)
+    if n < 1024.0:
+        return f"{int(n)} bytes" if n.is_integer() else f"{n} bytes"
+    divisor, suffix = _BYTES_UNITS[_scale_index(n, 1024.0, _BYTES_UNITS)]
+    return f"{n / divisor:.1f} {suffix}"
 
 def hr_num(num: float) -> str:
-    n = float(num)
-    for scale, name in SCALES:
-        if n >= scale:
-            return f"{int(n / scale)} {name}"
-    return f"{int(n)}" if n.is_integer() else f"{n}"
+    n = num if isinstance(num, float) else float(num)
+    if n < 1000.0:
+        return f"{int(n)}" if n.is_integer() else f"{n}"
+    scale, name = SCALES[_scale_index(n, 1000.0, SCALES)]
+    return f"{int(n / scale)} {name}"
 
 
 def pretty_uptime(uptime_seconds: int) -> str:
@@ -355,53 +389,139 @@ def substr(s: Any, start: int, length: int = None) -> str:
     return text[start:start + length]
 
 
+# The constant portion of the eval environment, built once at import time.
+_BASE_EVAL_ENV: Dict[str, Any] = {
+    # Safe builtins
+    "__builtins__": {},
+    # Numeric helpers
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "int": int,
+    "float": float,
+    "round": round,
+    "len": len,
+    # Human-readable helpers
+    "hr_bytime": hr_bytime,
+    "hr_bytes": hr_bytes,
+    "hr_num": hr_num,
+    "pretty_uptime": pretty_uptime,
+    # String helpers
+    "substr": substr,
+}
+
+
 def build_safe_eval_env(extra_vars: Dict[str, Any]) -> Dict[str, Any]:
-    env: Dict[str, Any] = {
-        # Safe builtins
-        "__builtins__": {},
-        # Numeric helpers
-        "abs": abs,
-        "min": min,
-        "max": max,
-        "int": int,
-        "float": float,
-        "round": round,
-        "len": len,
-        # Human-readable helpers
-        "hr_bytime": hr_bytime,
-        "hr_bytes": hr_bytes,
-        "hr_num": hr_num,
-        "pretty_uptime": pretty_uptime,
-        # String helpers
-        "substr": substr,
-    }
-    env.update(extra_vars)
-    return env
-
-
-def substitute_expr_variables(expr: str, variables: Dict[str, Any]) -> str:
+    return {**_BASE_EVAL_ENV, **extra_vars}
+
+
+# Snapshot of the MySQL key/value dict used by the memoized helpers below,
+# plus one alternation regex matching exactly its keys. Frozen to a read-only
+# mapping so the cached results stay valid for its lifetime.
+_current_vars: Mapping[str, Any] = types.MappingProxyType({})
+_current_var_pattern: re.Pattern = None
+
+
+def _build_var_pattern(variables: Mapping[str, Any]) -> re.Pattern:
+    """Build one alternation regex that matches exactly the variable names.
+
+    Longest names first so e.g. `Uptime_since_flush_status` wins over `Uptime`.
+    Matching only real variable names means non-variable tokens (`int`, `abs`,
+    string methods, ...) never reach the replacement callback at all.
+    """
+    if not variables:
+        return None
+    names = sorted(variables, key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(re.escape(name) for name in names) + r")\b")
+
+
+def set_eval_variables(variables: Dict[str, Any]) -> None:
+    """Install the variables snapshot used for expression substitution.
+
+    Invalidates the memoized substitutions, since cached results are only
+    valid for the snapshot they were computed against.
+    """
+    global _current_vars, _current_var_pattern
+    _current_vars = types.MappingProxyType(dict(variables))
+    _current_var_pattern = _build_var_pattern(_current_vars)
+    _compile_expr_cached.cache_clear()
+
+
+def _coerce_constant(value: Any) -> Any:
+    """Coerce a MySQL value to something embeddable as an AST constant.
+
+    Mirrors the textual substitution rules: numeric strings become real
+    numbers, other strings stay strings, and anything exotic is stringified.
+    """
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        if is_numeric_string(value):
+            try:
+                return int(value)
+            except ValueError:
+                return float(value)
+        return value
+    if isinstance(value, (bytes, bool)) or value is None:
+        return value
+    return str(value)
+
+
+class _VariableInliner(ast.NodeTransformer):
+    """Fold the current variables snapshot into an expression AST.
+
+    Name nodes that match a MySQL variable are replaced with Constant nodes,
+    so the compiled code carries the values directly instead of re-running a
+    textual substitution per evaluation.
+    """
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if isinstance(node.ctx, ast.Load) and node.id in _current_vars:
+            return ast.copy_location(
+                ast.Constant(value=_coerce_constant(_current_vars[node.id])), node
+            )
+        return node
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_expr_cached(expr: str):
+    """Parse, inline variables, and compile a rule expression exactly once.
+
+    Rules frequently repeat the same expression text, so amortizing the
+    parse+compile to one pass per unique expression pays off on large configs.
+    """
+    tree = _VariableInliner().visit(ast.parse(expr, mode="eval"))
+    ast.fix_missing_locations(tree)
+    return compile(tree, "<rule>", "eval")
+
+
+def substitute_expr_variables(
+    expr: str, variables: Mapping[str, Any], pattern: re.Pattern = None
+) -> str:
     """
     Replace identifiers that match keys in `variables` with their values (stringified),
     similar to Perl's word-boundary substitution.
     """
+    if pattern is None:
+        pattern = _build_var_pattern(variables)
+    if pattern is None:
+        return expr
 
     def repl(match: re.Match) -> str:
-        word = match.group(0)
-        if word in variables:
-            value = variables[word]
-            # Preserve numeric values; quote strings
-            if isinstance(value, (int, float)):
-                return str(value)
-            # Treat numeric strings as numbers
-            if isinstance(value, str) and is_numeric_string(value):
-                return value
-            # Fallback: quote strings and other types
-            return repr(value)
-        return word
-
-    return re.sub(r"\b([A-Za-z_][A-Za-z0-9_]*)\b", repl, expr)
+        value = variables[match.group(0)]
+        # Preserve numeric values; quote strings
+        if isinstance(value, (int, float)):
+            return str(value)
+        # Treat numeric strings as numbers
+        if isinstance(value, str) and is_numeric_string(value):
+            return value
+        # Fallback: quote strings and other types
+        return repr(value)
+
+    return pattern.sub(repl, expr)
 
 
+@functools.lru_cache(maxsize=4096)
 def build_condition_expression(comp_text: str, value_alias: str = "v") -> str:
     """Convert legacy comparison syntax to a Python expression using alias `v` as the expr value.
 
@@ -416,7 +536,7 @@ def build_condition_expression(comp_text: str, value_alias: str = "v") -> str:
     text = comp_text.strip()
 
     # Regex matchers
-    m = re.match(r"=~\s*/(.+?)/([a-zA-Z]*)$", text)
+    m = _RE_MATCH_RE.match(text)
     if m:
         pattern, flags = m.groups()
         pyflags = []
@@ -425,7 +545,7 @@ def build_condition_expression(comp_text: str, value_alias: str = "v") -> str:
         flags_expr = " | ".join(pyflags) if pyflags else "0"
         return f"re.search(r'{pattern}', str({value_alias}), {flags_expr}) is not None"
 
-    m = re.match(r"!~\s*/(.+?)/([a-zA-Z]*)$", text)
+    m = _NRE_MATCH_RE.match(text)
     if m:
         pattern, flags = m.groups()
         pyflags = []
@@ -445,90 +565,208 @@ def build_condition_expression(comp_text: str, value_alias: str = "v") -> str:
         return f"str({value_alias}){text}"
 
     # Leading comparison operators
-    if re.match(r"^[<>!=]", text):
+    if _LEAD_CMP_RE.match(text):
         return f"{value_alias} {text}"
 
     # Otherwise assume it's a full Python expression referencing v
     return text
 
 
+@functools.lru_cache(maxsize=4096)
+def _compile_expr_code(source: str):
+    """Compile an expression source string to a reusable code object.
+
+    eval() of a raw string re-runs the Python compiler on every call; caching
+    the code object keyed on its source makes that a one-time cost per unique
+    rule expression or condition.
+    """
+    return compile(source, "<rule>", "eval")
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_condition(comp_text: str):
+    """Compile a comparison to (code, extra_env), pre-compiling user regexes.
+
+    For `=~`/`!~` conditions the user's pattern is compiled to a re.Pattern
+    once and handed to the condition code as `_COND_PAT`, instead of leaving
+    `re.search` to look the pattern up in the re module's cache per rule.
+    Other comparisons go through build_condition_expression unchanged.
+    """
+    text = comp_text.strip()
+    for matcher, template in (
+        (_RE_MATCH_RE, "_COND_PAT.search(str(v)) is not None"),
+        (_NRE_MATCH_RE, "_COND_PAT.search(str(v)) is None"),
+    ):
+        m = matcher.match(text)
+        if m:
+            pattern, flags = m.groups()
+            compiled = re.compile(pattern, re.I if flags and "i" in flags.lower() else 0)
+            return _compile_expr_code(template), {"_COND_PAT": compiled}
+    return _compile_expr_code(build_condition_expression(text, value_alias="v")), None
+
+
 def parse_config_line(line: str) -> Tuple[str, str, str, str]:
-    parts = line.split("|||")
-    if len(parts) != 4:
+    if line.count("|||") != 3:
         raise ValueError("Invalid config line (expected 4 fields separated by '|||')")
-    label, comp, expr, output = [p.strip() for p in parts]
+    label, comp, expr, output = (p.strip() for p in line.split("|||", 3))
     return label, comp, expr, output
 
 
+# Typed config entries produced by _compile_config
+CategoryHeader = namedtuple("CategoryHeader", ["title"])
+Rule = namedtuple(
+    "Rule",
+    [
+        "label",
+        "comp",
+        "expr",
+        "output",
+        "is_version_expr",
+        "expr_code",
+        "cond_code",
+        "cond_extra",
+        "error",
+        "cond_error",
+    ],
+)
+
+
+def _compile_config(lines: Iterable[str]) -> List[Any]:
+    """Classify and compile config lines once into category headers and rules.
+
+    Blank lines, comments, and malformed rules are discarded here, and both
+    the expression and the condition are compiled up front. A rule whose
+    expression fails to compile carries the error so the evaluation loop can
+    skip it; a broken condition only disables the recommendation, and the
+    metric line still prints. Must run after set_eval_variables, since
+    compilation inlines the variables snapshot.
+    """
+    entries: List[Any] = []
+    for raw in lines:
+        stripped = raw.lstrip()
+        if not stripped:
+            continue
+        # The vast majority of comment lines are not category headers, so
+        # screen with a cheap substring test before paying for the regex match.
+        if stripped.startswith("#"):
+            if "|||" not in stripped and "category" in stripped[:32].lower():
+                # Only treat lines with an explicit Category label as headers
+                m_cat = _CAT_HEADER_RE.match(raw)
+                if m_cat and m_cat.group(1):
+                    entries.append(CategoryHeader(m_cat.group(1)))
+            # Skip comment lines (including commented-out rules) either way
+            continue
+        try:
+            label, comp, expr, output_text = parse_config_line(raw)
+        except Exception:
+            # Skip malformed lines silently to mimic robustness
+            continue
+        expr_code = cond_code = cond_extra = error = cond_error = None
+        try:
+            expr_code = _compile_expr_cached(expr)
+        except Exception as exc:
+            error = exc
+        if error is None and comp:
+            try:
+                cond_code, cond_extra = _compile_condition(comp)
+            except Exception as exc:
+                cond_error = exc
+        entries.append(
+            Rule(
+                label,
+                comp,
+                expr,
+                output_text,
+                _expr_mentions_version(expr),
+                expr_code,
+                cond_code,
+                cond_extra,
+                error,
+                cond_error,
+            )
+        )
+    return entries
+
+
 def evaluate_and_print(
-    lines: List[str],
+    lines: Iterable[str],
     variables: Dict[str, Any],
     output_mode: str,
     debug: bool,
     show_recommendations: bool,
 ) -> None:
-    # Keep pairs of (displayed_metric_line, recommendation_text)
-    recommendation_pairs: List[Tuple[str, str]] = []
+    set_eval_variables(variables)
+
+    # CSV output goes through csv.writer: proper quoting for values containing
+    # commas or newlines, and the row formatting happens in C.
+    csv_writer = None
+    if output_mode == "csv":
+        import csv
+
+        csv_writer = csv.writer(sys.stdout, lineterminator="\n")
+
+    # One shared eval environment for all rules; per-rule state (`v`/`_`) goes
+    # into a small locals dict mutated in place instead of a fresh dict per line.
+    globals_env = build_safe_eval_env({"re": re})
+    locals_env: Dict[str, Any] = {}
+
+    # Keep pairs of (displayed metric line or CSV row, recommendation_text)
+    recommendation_pairs: List[Tuple[Any, str]] = []
     current_category: str = ""
 
-    for raw in lines:
-        if not raw.strip():
+    for entry in _compile_config(lines):
+        if isinstance(entry, CategoryHeader):
+            if entry.title != current_category:
+                current_category = entry.title
+                if csv_writer is not None:
+                    csv_writer.writerow(("Category", current_category))
+                else:
+                    print(f"\n{current_category}")
             continue
-        # Handle category headers expressed as comment lines without rules
-        if raw.lstrip().startswith("#"):
-            if "|||" not in raw:
-                # Only treat lines with an explicit Category label as headers
-                m_cat = re.match(r"^\s*#\s*Category\s*:\s*(.+?)\s*$", raw, flags=re.IGNORECASE)
-                if m_cat:
-                    category_text = m_cat.group(1)
-                    if category_text and category_text != current_category:
-                        current_category = category_text
-                        if output_mode == "csv":
-                            print(f"Category,{current_category}")
-                        else:
-                            print(f"\n{current_category}")
-                # Regardless, skip pure comment lines
-                continue
-            # Commented-out rule; skip
-            continue
-        try:
-            label, comp, expr, output_text = parse_config_line(raw)
-        except Exception:
-            # Skip malformed lines silently to mimic robustness
+
+        rule = entry
+        if rule.error is not None:
+            debug_print(debug, f"skipping rule '{rule.label}': {rule.error}")
             continue
 
         if debug:
-            print(f"expr starts as {expr}")
-        parsed_expr = substitute_expr_variables(expr, variables)
-        if debug:
-            print(f"expr after parsing is {parsed_expr}")
-
+            print(f"expr starts as {rule.expr}")
+            print(
+                f"expr after parsing is "
+                f"{substitute_expr_variables(rule.expr, _current_vars, _current_var_pattern)}"
+            )
+
+        # Compile errors were weeded out at load time; this only guards
+        # data-dependent failures (missing variables, division by zero, ...)
         try:
-            value = eval(parsed_expr, build_safe_eval_env({}))
+            value = eval(rule.expr_code, globals_env)
         except Exception:
-            # Fall back to raw string if eval fails
-            value = parsed_expr
+            # Fall back to the substituted text if evaluation fails
+            value = substitute_expr_variables(rule.expr, _current_vars, _current_var_pattern)
 
         if debug:
             print(f"expr evals to '{value}'")
 
-        if output_mode == "csv":
-            displayed_metric_line = f"{label},{value}"
-            print(displayed_metric_line)
+        if csv_writer is not None:
+            # Keep the row itself so the recommendations section can rewrite
+            # it through the same writer
+            displayed_metric_line = (rule.label, value)
+            csv_writer.writerow(displayed_metric_line)
         else:
-            displayed_metric_line = f"{label}: {round2_if_numeric(value, expr)}"
+            displayed_metric_line = f"{rule.label}: {round2_if_numeric(value, rule.is_version_expr)}"
             print(displayed_metric_line)
 
-        # Determine if recommendation condition is met
-        comp_text = comp.strip()
-        if comp_text:
+        # Determine if recommendation condition is met; a condition that did
+        # not compile behaves like the baseline: condition never matches
+        if rule.cond_error is not None:
+            debug_print(debug, f"cannot compile condition for '{rule.label}': {rule.cond_error}")
+        if rule.cond_code is not None:
             try:
-                condition_ok = bool(
-                    eval(
-                        build_condition_expression(comp_text, value_alias="v"),
-                        build_safe_eval_env({"re": re, "v": value, "_": value}),
-                    )
-                )
+                locals_env["v"] = value
+                locals_env["_"] = value
+                if rule.cond_extra:
+                    locals_env.update(rule.cond_extra)
+                condition_ok = bool(eval(rule.cond_code, globals_env, locals_env))
             except Exception:
                 condition_ok = False
         else:
@@ -536,16 +774,19 @@ def evaluate_and_print(
 
         if condition_ok:
             if debug:
-                print(f"\t{label} matches {comp_text}")
-            recommendation_pairs.append((displayed_metric_line, output_text))
+                print(f"\t{rule.label} matches {rule.comp}")
+            recommendation_pairs.append((displayed_metric_line, rule.output))
 
     if show_recommendations and recommendation_pairs:
         print("\n\nRECOMMENDATIONS:")
-        if output_mode == "csv":
-            # CSV: print the metric line followed by a Recommendation line
-            for metric_line, rec_text in recommendation_pairs:
-                print(metric_line)
-                print(f"Recommendation,{rec_text}")
+        if csv_writer is not None:
+            # CSV: each metric row followed by a Recommendation row, written
+            # in one batch
+            rows = []
+            for metric_row, rec_text in recommendation_pairs:
+                rows.append(metric_row)
+                rows.append(("Recommendation", rec_text))
+            csv_writer.writerows(rows)
         else:
             # Pretty: print the metric line (bold), then the recommendation, then a blank line
             ANSI_BOLD = "\033[1m"